@@ -5,14 +5,16 @@ Provides tools to connect, monitor, and interact with ESP32 devices over serial.
 """
 
 import asyncio
+import itertools
 import logging
+import os
+import selectors
 import threading
-import time
+from collections import deque
 from typing import Dict, Optional
 from contextlib import asynccontextmanager
 
 import serial
-from serial.tools import list_ports
 from mcp.server import Server
 from mcp.types import Tool, TextContent
 
@@ -27,8 +29,116 @@ DEVICE_ALIASES = {
     "receiver": "/dev/ttyWEBASTORECV",
 }
 
-# Active serial connections
-connections: Dict[str, serial.Serial] = {}
+# Longest partial line kept while waiting for its '\n' before it is
+# flushed as a line of its own
+_RX_PENDING_MAX = 4096
+
+# Tool descriptors (static, so built once rather than per list_tools call)
+_TOOLS = [
+    Tool(
+        name="list_devices",
+        description="List available Webasto serial devices (simulator, sender, receiver)",
+        inputSchema={
+            "type": "object",
+            "properties": {},
+            "required": [],
+        },
+    ),
+    Tool(
+        name="connect_device",
+        description="Connect to a Webasto device for serial communication",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "device": {
+                    "type": "string",
+                    "description": "Device alias (simulator, sender, receiver) or full path",
+                    "enum": ["simulator", "sender", "receiver"],
+                },
+                "baud_rate": {
+                    "type": "integer",
+                    "description": "Baud rate (default: 115200)",
+                    "default": 115200,
+                },
+            },
+            "required": ["device"],
+        },
+    ),
+    Tool(
+        name="disconnect_device",
+        description="Disconnect from a Webasto device",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "device": {
+                    "type": "string",
+                    "description": "Device alias (simulator, sender, receiver)",
+                    "enum": ["simulator", "sender", "receiver"],
+                },
+            },
+            "required": ["device"],
+        },
+    ),
+    Tool(
+        name="read_serial",
+        description="Read serial output from a connected device (returns last N lines from buffer)",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "device": {
+                    "type": "string",
+                    "description": "Device alias (simulator, sender, receiver)",
+                    "enum": ["simulator", "sender", "receiver"],
+                },
+                "lines": {
+                    "type": "integer",
+                    "description": "Number of lines to return (default: 50)",
+                    "default": 50,
+                },
+            },
+            "required": ["device"],
+        },
+    ),
+    Tool(
+        name="write_serial",
+        description="Write data to a connected device",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "device": {
+                    "type": "string",
+                    "description": "Device alias (simulator, sender, receiver)",
+                    "enum": ["simulator", "sender", "receiver"],
+                },
+                "data": {
+                    "type": "string",
+                    "description": "Data to send (newline will be appended automatically)",
+                },
+                "drain": {
+                    "type": "boolean",
+                    "description": "Wait until all data has been transmitted (default: false)",
+                    "default": False,
+                },
+            },
+            "required": ["device", "data"],
+        },
+    ),
+    Tool(
+        name="get_device_status",
+        description="Get connection status and configuration for a device",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "device": {
+                    "type": "string",
+                    "description": "Device alias (simulator, sender, receiver)",
+                    "enum": ["simulator", "sender", "receiver"],
+                },
+            },
+            "required": ["device"],
+        },
+    ),
+]
 
 
 class SerialDeviceManager:
@@ -36,40 +146,145 @@ class SerialDeviceManager:
 
     def __init__(self):
         self.connections: Dict[str, serial.Serial] = {}
-        self.read_buffers: Dict[str, list] = {}
-        self.buffer_locks: Dict[str, threading.Lock] = {}
-        self.reader_threads: Dict[str, threading.Thread] = {}
-        self.reader_running: Dict[str, bool] = {}
+        self.read_buffers: Dict[str, deque] = {}
+        self._rx_accum: Dict[str, bytearray] = {}
+        # Ports are read by a dedicated selector thread, not the event loop's
+        # loop.add_reader(): connect()/disconnect() run on worker threads, and
+        # disconnect() must stop reads before it closes the fd. Loop readers
+        # could only be removed asynchronously via call_soon_threadsafe().
+        self._selector = selectors.DefaultSelector()
+        self._reader: Optional[threading.Thread] = None
+        # Serializes connect/disconnect, which now run on worker threads
+        self._lock = threading.Lock()
+        self._reader_lock = threading.Lock()
+        self._reader_stop = threading.Event()
+        # Held by the reader across "key still registered?" + os.read() and by
+        # disconnect() across unregister + close, so a closed fd number that
+        # a new port reuses can never be read on behalf of the old device
+        self._fd_lock = threading.Lock()
+        # Self-pipe so the reader can be woken out of select() to stop
+        self._wakeup_r, self._wakeup_w = os.pipe()
+        self._selector.register(self._wakeup_r, selectors.EVENT_READ, data=None)
+        self._tx_queues: Dict[str, asyncio.Queue] = {}
+        self._tx_tasks: Dict[str, asyncio.Task] = {}
+        # (port, live status values, formatted text) per connected device
+        self._status_cache: Dict[str, tuple] = {}
         self.buffer_max_lines = 2000
 
-    def _reader_thread(self, device: str):
-        """Background thread that continuously reads from serial port"""
-        logger.info(f"[{device}] Reader thread started")
-        while self.reader_running.get(device, False):
-            try:
-                ser = self.connections.get(device)
-                if ser is None or not ser.is_open:
-                    break
-                
-                if ser.in_waiting > 0:
-                    line = ser.readline().decode('utf-8', errors='replace').strip()
-                    if line:
-                        with self.buffer_locks[device]:
-                            self.read_buffers[device].append(line)
-                            # Keep buffer size manageable
-                            while len(self.read_buffers[device]) > self.buffer_max_lines:
-                                self.read_buffers[device].pop(0)
-                else:
-                    time.sleep(0.01)  # Small sleep to avoid busy waiting
-            except Exception as e:
-                if self.reader_running.get(device, False):
-                    logger.error(f"[{device}] Reader error: {e}")
-                break
-        logger.info(f"[{device}] Reader thread stopped")
+    def _reader_thread(self):
+        """Background thread that multiplexes reads from all connected ports"""
+        logger.info("Reader thread started")
+        select = self._selector.select
+        registered = self._selector.get_map()
+        read = os.read
+        stop = self._reader_stop
+        fd_lock = self._fd_lock
+        while not stop.is_set():
+            # Block in the kernel until a registered port has data. No timeout
+            # is needed: epoll/kqueue pick up ports registered from other
+            # threads while select() is already waiting.
+            for key, _ in select():
+                if key.data is None:
+                    # Wakeup pipe: drain it and re-check the stop event
+                    read(key.fd, 512)
+                    continue
+                # key.data carries the device's (name, accumulator, buffer)
+                # so the hot path needs no per-chunk dict lookups
+                device, acc, buffer = key.data
+                with fd_lock:
+                    if registered.get(key.fd) is not key:
+                        # Stale event: the port was disconnected after
+                        # select() returned; its fd may now be a new port
+                        continue
+                    try:
+                        # Drain whatever is pending in a single syscall
+                        data = read(key.fd, 4096)
+                        if not data:
+                            raise OSError("device reported EOF")
+                    except BlockingIOError:
+                        # Spurious wakeup; the port is fine, wait for the next event
+                        continue
+                    except OSError as e:
+                        # Port went away (e.g. unplugged); stop polling it
+                        if device in self.connections:
+                            logger.error(f"[{device}] Reader error: {e}")
+                        self._unregister(key.fd, key)
+                        continue
+                self._feed(acc, buffer, data)
+        logger.info("Reader thread stopped")
+
+    @staticmethod
+    def _feed(acc: bytearray, buffer: deque, data: bytes):
+        """Append raw bytes to a device accumulator and buffer complete lines"""
+        acc.extend(data)
+        if b'\n' in data:
+            # One C-level split per chunk; the trailing partial line stays in
+            # acc (updated in place, since the selector key holds this
+            # bytearray). Splitting bytes on b'\n' can never cut a UTF-8
+            # sequence in half, so no incremental decoder is needed for
+            # chunks ending mid-character.
+            lines = bytes(acc).split(b'\n')
+            acc[:] = lines.pop()
+            for line in lines:
+                # Lines stay raw bytes; read() decodes only what it returns
+                line = line.strip()
+                if line:
+                    # Bounded deque drops the oldest line once full.
+                    # deque.append is atomic under the GIL, so no lock.
+                    buffer.append(line)
+        if len(acc) > _RX_PENDING_MAX:
+            # Output that never sends '\n' must not grow acc without bound.
+            # This cut may split a UTF-8 character; read() decodes with
+            # errors='replace'.
+            line = bytes(acc).strip()
+            acc.clear()
+            if line:
+                buffer.append(line)
+
+    def _start_reader(self):
+        """Start the shared reader thread if it is not already running"""
+        with self._reader_lock:
+            if self._reader is not None:
+                if not self._reader_stop.is_set():
+                    return
+                # A previous stop is still winding down; never run two
+                # threads on the same selector
+                self._reader.join(timeout=1.0)
+                if self._reader.is_alive():
+                    raise Exception("Previous reader thread did not stop")
+            self._reader_stop.clear()
+            self._reader = threading.Thread(target=self._reader_thread, daemon=True)
+            self._reader.start()
+
+    def _stop_reader(self, force: bool = False):
+        """Stop the shared reader thread once no ports remain connected"""
+        with self._reader_lock:
+            if self._reader is None or (self.connections and not force):
+                return
+            self._reader_stop.set()
+            os.write(self._wakeup_w, b'\0')
+            self._reader.join(timeout=1.0)
+            if self._reader.is_alive():
+                # Keep the handle so _start_reader waits for it to exit
+                logger.warning("Reader thread did not stop within 1s")
+                return
+            self._reader = None
+
+    def _unregister(self, fd: int, key: Optional[selectors.SelectorKey] = None):
+        """Remove a file descriptor from the reader's selector if present
+
+        When key is given, only that registration is removed, so a port that
+        has since reused the fd number keeps being polled.
+        """
+        if key is not None and self._selector.get_map().get(fd) is not key:
+            return
+        try:
+            self._selector.unregister(fd)
+        except (KeyError, ValueError):
+            pass
 
     def list_devices(self) -> list[dict]:
         """List available Webasto devices"""
-        import os
         devices = []
         for alias, path in DEVICE_ALIASES.items():
             try:
@@ -96,59 +311,92 @@ class SerialDeviceManager:
 
     def connect(self, device: str, baud_rate: int = 115200, timeout: float = 0.1) -> str:
         """Connect to a device and start background reader"""
-        if device in self.connections and self.connections[device].is_open:
-            return f"Already connected to {device}"
+        with self._lock:
+            if device in self.connections and self.connections[device].is_open:
+                return f"Already connected to {device}"
 
-        path = DEVICE_ALIASES.get(device, device)
-        
-        try:
-            ser = serial.Serial(
-                port=path,
-                baudrate=baud_rate,
-                timeout=timeout,
-                bytesize=serial.EIGHTBITS,
-                parity=serial.PARITY_NONE,
-                stopbits=serial.STOPBITS_ONE,
-            )
-            self.connections[device] = ser
-            self.read_buffers[device] = []
-            self.buffer_locks[device] = threading.Lock()
-            
-            # Start background reader thread
-            self.reader_running[device] = True
-            thread = threading.Thread(target=self._reader_thread, args=(device,), daemon=True)
-            thread.start()
-            self.reader_threads[device] = thread
-            
-            logger.info(f"Connected to {device} at {path} ({baud_rate} baud)")
-            return f"Connected to {device} at {path} ({baud_rate} baud) - background reader started"
-        except Exception as e:
-            logger.error(f"Failed to connect to {device}: {e}")
-            raise Exception(f"Failed to connect to {device}: {e}")
+            path = DEVICE_ALIASES.get(device, device)
+
+            try:
+                ser = serial.Serial(
+                    port=path,
+                    baudrate=baud_rate,
+                    timeout=timeout,
+                    bytesize=serial.EIGHTBITS,
+                    parity=serial.PARITY_NONE,
+                    stopbits=serial.STOPBITS_ONE,
+                )
+                # USB-serial drivers (FTDI, CP210x) otherwise batch RX bytes on a
+                # ~16 ms latency timer. Linux only; unsupported ports keep defaults.
+                try:
+                    ser.set_low_latency_mode(True)
+                except (AttributeError, NotImplementedError, ValueError, OSError) as e:
+                    logger.debug(f"[{device}] Low latency mode unavailable: {e}")
+                self.connections[device] = ser
+                if device in self._status_cache:
+                    del self._status_cache[device]
+                self.read_buffers[device] = deque(maxlen=self.buffer_max_lines)
+                self._rx_accum[device] = bytearray()
+
+                # Hand the port to the shared reader thread
+                self._selector.register(
+                    ser.fileno(),
+                    selectors.EVENT_READ,
+                    data=(device, self._rx_accum[device], self.read_buffers[device]),
+                )
+                self._start_reader()
+
+                logger.info(f"Connected to {device} at {path} ({baud_rate} baud)")
+                return f"Connected to {device} at {path} ({baud_rate} baud) - background reader started"
+            except Exception as e:
+                logger.error(f"Failed to connect to {device}: {e}")
+                raise Exception(f"Failed to connect to {device}: {e}")
 
     def disconnect(self, device: str) -> str:
         """Disconnect from a device and stop background reader"""
-        if device not in self.connections:
-            return f"Not connected to {device}"
+        with self._lock:
+            if device not in self.connections:
+                return f"Not connected to {device}"
 
-        try:
-            # Stop background reader
-            self.reader_running[device] = False
-            if device in self.reader_threads:
-                self.reader_threads[device].join(timeout=1.0)
-                del self.reader_threads[device]
-            
-            self.connections[device].close()
-            del self.connections[device]
-            if device in self.read_buffers:
-                del self.read_buffers[device]
-            if device in self.buffer_locks:
-                del self.buffer_locks[device]
-            logger.info(f"Disconnected from {device}")
-            return f"Disconnected from {device}"
-        except Exception as e:
-            logger.error(f"Error disconnecting from {device}: {e}")
-            raise Exception(f"Error disconnecting from {device}: {e}")
+            try:
+                # Stop reading before the fd is closed and possibly reused
+                ser = self.connections[device]
+                with self._fd_lock:
+                    self._unregister(ser.fileno())
+                    ser.close()
+                del self.connections[device]
+                if device in self._status_cache:
+                    del self._status_cache[device]
+                if device in self.read_buffers:
+                    del self.read_buffers[device]
+                if device in self._rx_accum:
+                    del self._rx_accum[device]
+                self._stop_reader()
+                logger.info(f"Disconnected from {device}")
+                return f"Disconnected from {device}"
+            except Exception as e:
+                logger.error(f"Error disconnecting from {device}: {e}")
+                raise Exception(f"Error disconnecting from {device}: {e}")
+
+    def close_all(self):
+        """Disconnect every device and release the reader's resources"""
+        for device in list(self.connections):
+            try:
+                self.disconnect(device)
+            except Exception:
+                # Already logged by disconnect; keep closing the rest
+                pass
+        # A failed disconnect can skip _stop_reader; the reader must not
+        # outlive the selector it waits on
+        self._stop_reader(force=True)
+        if self._reader is not None:
+            # Still inside select(); leak the selector and pipe rather than
+            # close them under a live thread
+            logger.warning("Reader thread still running; leaving selector open")
+            return
+        self._selector.close()
+        os.close(self._wakeup_r)
+        os.close(self._wakeup_w)
 
     def read(self, device: str, lines: int = 50) -> str:
         """Read buffered data from device (background thread collects data)"""
@@ -156,228 +404,294 @@ class SerialDeviceManager:
             raise Exception(f"Not connected to {device}")
 
         try:
-            with self.buffer_locks[device]:
-                buffer = self.read_buffers.get(device, [])
-                recent = buffer[-lines:] if len(buffer) > lines else buffer[:]
+            buffer = self.read_buffers.get(device, ())
+            # Include the not yet terminated tail (e.g. a "> " prompt) as the
+            # last line; it stays pending until its '\n' arrives
+            pending = bytes(self._rx_accum.get(device, b"")).strip()
+            if lines <= 0:
+                pending = b""
+            n = len(buffer)
+            wanted = lines - 1 if pending else lines
+            # list(islice(...)) copies the deque entirely in C without
+            # releasing the GIL, so the reader thread cannot append mid-copy
+            recent = list(itertools.islice(buffer, max(0, n - wanted), n))
+            if pending:
+                recent.append(pending)
             
             if not recent:
                 return f"No data available from {device}"
             
-            return "\n".join(recent)
+            return b"\n".join(recent).decode('utf-8', errors='replace')
         except Exception as e:
             logger.error(f"Error reading from {device}: {e}")
             raise Exception(f"Error reading from {device}: {e}")
 
-    def write(self, device: str, data: str) -> str:
-        """Write data to device"""
+    async def write(self, device: str, data: str, drain: bool = False) -> str:
+        """Queue data for the device's writer task and wait until it is written
+
+        Writes that pile up while a previous one is in flight are sent
+        together in a single write_bytes() call. The kernel TTY buffer queues
+        the bytes, so by default this returns without waiting for them to
+        leave the UART; pass drain=True to block until transmission completes.
+        """
+        if device not in self.connections:
+            raise Exception(f"Not connected to {device}")
+
+        # Ensure newline at end
+        payload = data.encode('utf-8')
+        if not payload.endswith(b'\n'):
+            payload += b'\n'
+
+        queue = self._tx_queues.get(device)
+        if queue is None:
+            queue = self._tx_queues[device] = asyncio.Queue()
+            self._tx_tasks[device] = asyncio.create_task(self._tx_loop(device, queue))
+        done = asyncio.get_running_loop().create_future()
+        queue.put_nowait((payload, drain, done))
+        written = await done
+        logger.info(f"Wrote {written} bytes to {device}")
+        return f"Wrote {written} bytes to {device}"
+
+    async def _tx_loop(self, device: str, queue: asyncio.Queue):
+        """Writer task that coalesces everything queued for a device"""
+        while True:
+            batch = [await queue.get()]
+            while not queue.empty():
+                batch.append(queue.get_nowait())
+            payload = b"".join(item[0] for item in batch)
+            drain = any(item[1] for item in batch)
+            write = asyncio.ensure_future(
+                asyncio.to_thread(self.write_bytes, device, payload, drain)
+            )
+            try:
+                await asyncio.shield(write)
+            except asyncio.CancelledError:
+                # The worker thread cannot be interrupted and may still send
+                # the batch; report its real outcome once it finishes
+                write.add_done_callback(
+                    lambda fut, batch=batch: self._settle_writes(device, batch, fut)
+                )
+                raise
+            self._settle_writes(device, batch, write)
+
+    @staticmethod
+    def _settle_writes(device: str, batch: list, write: asyncio.Future):
+        """Resolve each queued write in a batch from the batch write's outcome"""
+        if write.cancelled():
+            SerialDeviceManager._fail_writes(batch, Exception(f"Not connected to {device}"))
+        elif write.exception() is not None:
+            SerialDeviceManager._fail_writes(batch, write.exception())
+        else:
+            for item_payload, _, done in batch:
+                if not done.done():
+                    done.set_result(len(item_payload))
+
+    @staticmethod
+    def _fail_writes(items: list, error: Exception):
+        """Fail the futures of queued writes that will never be sent"""
+        for _, _, done in items:
+            if not done.done():
+                done.set_exception(error)
+
+    def stop_writers(self, device: Optional[str] = None):
+        """Cancel writer tasks for one device, or all (call from the event loop)
+
+        Writes still queued fail instead of leaving their callers waiting;
+        a batch already handed to write_bytes() reports its real outcome.
+        """
+        devices = [device] if device is not None else list(self._tx_tasks)
+        for dev in devices:
+            task = self._tx_tasks.pop(dev, None)
+            if task is not None:
+                task.cancel()
+            queue = self._tx_queues.pop(dev, None)
+            if queue is not None:
+                pending = []
+                while not queue.empty():
+                    pending.append(queue.get_nowait())
+                self._fail_writes(pending, Exception(f"Not connected to {dev}"))
+
+    def write_bytes(self, device: str, payload: bytes, drain: bool = False) -> int:
+        """Write raw bytes to device, optionally waiting for them to drain"""
         if device not in self.connections:
             raise Exception(f"Not connected to {device}")
 
         ser = self.connections[device]
         try:
-            # Ensure newline at end
-            if not data.endswith('\n'):
-                data += '\n'
-            
-            written = ser.write(data.encode('utf-8'))
-            ser.flush()
-            logger.info(f"Wrote {written} bytes to {device}")
-            return f"Wrote {written} bytes to {device}"
+            written = ser.write(payload)
+            if drain:
+                ser.flush()
+            return written
         except Exception as e:
             logger.error(f"Error writing to {device}: {e}")
             raise Exception(f"Error writing to {device}: {e}")
 
-    def get_status(self, device: str) -> dict:
-        """Get device status"""
-        path = DEVICE_ALIASES.get(device, device)
-        connected = device in self.connections and self.connections[device].is_open
-        
+    def _live_status(self, device: str, ser: serial.Serial) -> tuple:
+        """Status values that change while a device stays connected"""
+        return (
+            len(self.read_buffers.get(device, ())),
+            ser.in_waiting,
+            ser.fileno() in self._selector.get_map(),
+        )
+
+    @staticmethod
+    def _status(device: str, ser: Optional[serial.Serial], live: Optional[tuple]) -> dict:
+        """Build a status dict; live is None when the device is not connected"""
         status = {
             "device": device,
-            "path": path,
-            "connected": connected,
+            "path": DEVICE_ALIASES.get(device, device),
+            "connected": live is not None,
         }
 
-        if connected:
-            ser = self.connections[device]
-            with self.buffer_locks.get(device, threading.Lock()):
-                buffer_lines = len(self.read_buffers.get(device, []))
+        if live is not None:
+            buffer_lines, in_waiting, reader_active = live
             status.update({
                 "baud_rate": ser.baudrate,
                 "timeout": ser.timeout,
-                "in_waiting": ser.in_waiting,
+                "in_waiting": in_waiting,
                 "buffer_lines": buffer_lines,
-                "reader_active": self.reader_running.get(device, False),
+                "reader_active": reader_active,
             })
 
         return status
 
+    def get_status(self, device: str) -> dict:
+        """Get device status"""
+        ser = self.connections.get(device)
+        live = self._live_status(device, ser) if ser is not None and ser.is_open else None
+        return self._status(device, ser, live)
+
+    def get_status_text(self, device: str) -> str:
+        """Formatted get_device_status response, cached per connected device
+
+        The cache key is every value that changes while connected, so a hit
+        is never stale; it just skips rebuilding and formatting the status
+        when a client polls an idle or steady-state port.
+        """
+        ser = self.connections.get(device)
+        if ser is None or not ser.is_open:
+            return _format_status(device, self._status(device, ser, None))
+
+        live = self._live_status(device, ser)
+        cached = self._status_cache.get(device)
+        # Matching the port object guards against an entry written by a
+        # status call racing a disconnect/reconnect
+        if cached is not None and cached[0] is ser and cached[1] == live:
+            return cached[2]
+
+        text = _format_status(device, self._status(device, ser, live))
+        self._status_cache[device] = (ser, live, text)
+        return text
+
+
+def _icon(dev: dict) -> str:
+    """Status label shown for a device in list_devices"""
+    if dev.get("connected"):
+        return "🟢 Connected"
+    return "🟡 Available" if dev.get("exists") else "🔴 Not Found"
+
+
+def _format_status(device: str, status: dict) -> str:
+    """Response text for get_device_status"""
+    body = "\n".join(f"  {key}: {value}" for key, value in status.items())
+    return f"Device Status for '{device}':\n" + body + "\n"
+
+
+# Tool handlers. Serial I/O can block (port open, tcdrain), so every
+# device manager call is kept off the event loop.
+async def _handle_list_devices(manager: SerialDeviceManager, arguments: dict) -> list[TextContent]:
+    devices = await asyncio.to_thread(manager.list_devices)
+    body = "\n".join(f"- {dev['alias']}: {dev['path']} - {_icon(dev)}" for dev in devices)
+    result = "Available Webasto Devices:\n\n" + body + "\n"
+    return [TextContent(type="text", text=result)]
+
+
+async def _handle_connect_device(manager: SerialDeviceManager, arguments: dict) -> list[TextContent]:
+    device = arguments["device"]
+    baud_rate = arguments.get("baud_rate", 115200)
+    result = await asyncio.to_thread(manager.connect, device, baud_rate)
+    return [TextContent(type="text", text=result)]
+
+
+async def _handle_disconnect_device(manager: SerialDeviceManager, arguments: dict) -> list[TextContent]:
+    device = arguments["device"]
+    try:
+        result = await asyncio.to_thread(manager.disconnect, device)
+    finally:
+        manager.stop_writers(device)
+    return [TextContent(type="text", text=result)]
+
+
+async def _handle_read_serial(manager: SerialDeviceManager, arguments: dict) -> list[TextContent]:
+    device = arguments["device"]
+    lines = arguments.get("lines", 50)
+    result = await asyncio.to_thread(manager.read, device, lines)
+    return [TextContent(type="text", text=f"=== {device} serial output ===\n{result}")]
+
+
+async def _handle_write_serial(manager: SerialDeviceManager, arguments: dict) -> list[TextContent]:
+    device = arguments["device"]
+    data = arguments["data"]
+    drain = arguments.get("drain", False)
+    result = await manager.write(device, data, drain)
+    return [TextContent(type="text", text=result)]
+
+
+async def _handle_get_device_status(manager: SerialDeviceManager, arguments: dict) -> list[TextContent]:
+    device = arguments["device"]
+    result = await asyncio.to_thread(manager.get_status_text, device)
+    return [TextContent(type="text", text=result)]
+
+
+# Tool name -> handler
+_HANDLERS = {
+    "list_devices": _handle_list_devices,
+    "connect_device": _handle_connect_device,
+    "disconnect_device": _handle_disconnect_device,
+    "read_serial": _handle_read_serial,
+    "write_serial": _handle_write_serial,
+    "get_device_status": _handle_get_device_status,
+}
+
 
-# Global device manager
-device_manager = SerialDeviceManager()
+@asynccontextmanager
+async def _lifespan():
+    """Own a device manager for one server run and release its ports on exit"""
+    manager = SerialDeviceManager()
+    try:
+        yield manager
+    finally:
+        manager.stop_writers()
+        await asyncio.to_thread(manager.close_all)
 
 
 async def serve():
     """Run the MCP server"""
+    from mcp.server.stdio import stdio_server
+
     server = Server("webasto-serial-debug")
 
-    @server.list_tools()
-    async def list_tools() -> list[Tool]:
-        """List available tools"""
-        return [
-            Tool(
-                name="list_devices",
-                description="List available Webasto serial devices (simulator, sender, receiver)",
-                inputSchema={
-                    "type": "object",
-                    "properties": {},
-                    "required": [],
-                },
-            ),
-            Tool(
-                name="connect_device",
-                description="Connect to a Webasto device for serial communication",
-                inputSchema={
-                    "type": "object",
-                    "properties": {
-                        "device": {
-                            "type": "string",
-                            "description": "Device alias (simulator, sender, receiver) or full path",
-                            "enum": ["simulator", "sender", "receiver"],
-                        },
-                        "baud_rate": {
-                            "type": "integer",
-                            "description": "Baud rate (default: 115200)",
-                            "default": 115200,
-                        },
-                    },
-                    "required": ["device"],
-                },
-            ),
-            Tool(
-                name="disconnect_device",
-                description="Disconnect from a Webasto device",
-                inputSchema={
-                    "type": "object",
-                    "properties": {
-                        "device": {
-                            "type": "string",
-                            "description": "Device alias (simulator, sender, receiver)",
-                            "enum": ["simulator", "sender", "receiver"],
-                        },
-                    },
-                    "required": ["device"],
-                },
-            ),
-            Tool(
-                name="read_serial",
-                description="Read serial output from a connected device (returns last N lines from buffer)",
-                inputSchema={
-                    "type": "object",
-                    "properties": {
-                        "device": {
-                            "type": "string",
-                            "description": "Device alias (simulator, sender, receiver)",
-                            "enum": ["simulator", "sender", "receiver"],
-                        },
-                        "lines": {
-                            "type": "integer",
-                            "description": "Number of lines to return (default: 50)",
-                            "default": 50,
-                        },
-                    },
-                    "required": ["device"],
-                },
-            ),
-            Tool(
-                name="write_serial",
-                description="Write data to a connected device",
-                inputSchema={
-                    "type": "object",
-                    "properties": {
-                        "device": {
-                            "type": "string",
-                            "description": "Device alias (simulator, sender, receiver)",
-                            "enum": ["simulator", "sender", "receiver"],
-                        },
-                        "data": {
-                            "type": "string",
-                            "description": "Data to send (newline will be appended automatically)",
-                        },
-                    },
-                    "required": ["device", "data"],
-                },
-            ),
-            Tool(
-                name="get_device_status",
-                description="Get connection status and configuration for a device",
-                inputSchema={
-                    "type": "object",
-                    "properties": {
-                        "device": {
-                            "type": "string",
-                            "description": "Device alias (simulator, sender, receiver)",
-                            "enum": ["simulator", "sender", "receiver"],
-                        },
-                    },
-                    "required": ["device"],
-                },
-            ),
-        ]
+    async with _lifespan() as device_manager:
 
-    @server.call_tool()
-    async def call_tool(name: str, arguments: dict) -> list[TextContent]:
-        """Handle tool calls"""
-        try:
-            if name == "list_devices":
-                devices = device_manager.list_devices()
-                result = "Available Webasto Devices:\n\n"
-                for dev in devices:
-                    status = "🟢 Connected" if dev.get("connected") else ("🟡 Available" if dev.get("exists") else "🔴 Not Found")
-                    result += f"- {dev['alias']}: {dev['path']} - {status}\n"
-                return [TextContent(type="text", text=result)]
-
-            elif name == "connect_device":
-                device = arguments["device"]
-                baud_rate = arguments.get("baud_rate", 115200)
-                result = device_manager.connect(device, baud_rate)
-                return [TextContent(type="text", text=result)]
-
-            elif name == "disconnect_device":
-                device = arguments["device"]
-                result = device_manager.disconnect(device)
-                return [TextContent(type="text", text=result)]
-
-            elif name == "read_serial":
-                device = arguments["device"]
-                lines = arguments.get("lines", 50)
-                result = device_manager.read(device, lines)
-                return [TextContent(type="text", text=f"=== {device} serial output ===\n{result}")]
-
-            elif name == "write_serial":
-                device = arguments["device"]
-                data = arguments["data"]
-                result = device_manager.write(device, data)
-                return [TextContent(type="text", text=result)]
-
-            elif name == "get_device_status":
-                device = arguments["device"]
-                status = device_manager.get_status(device)
-                result = f"Device Status for '{device}':\n"
-                for key, value in status.items():
-                    result += f"  {key}: {value}\n"
-                return [TextContent(type="text", text=result)]
-
-            else:
-                raise ValueError(f"Unknown tool: {name}")
+        @server.list_tools()
+        async def list_tools() -> list[Tool]:
+            """List available tools"""
+            return _TOOLS
 
-        except Exception as e:
-            logger.error(f"Error in tool {name}: {e}")
-            return [TextContent(type="text", text=f"Error: {str(e)}")]
+        @server.call_tool()
+        async def call_tool(name: str, arguments: dict) -> list[TextContent]:
+            """Handle tool calls"""
+            try:
+                handler = _HANDLERS.get(name)
+                if handler is None:
+                    raise ValueError(f"Unknown tool: {name}")
+                return await handler(device_manager, arguments)
 
-    # Run the server
-    from mcp.server.stdio import stdio_server
+            except Exception as e:
+                logger.error(f"Error in tool {name}: {e}")
+                return [TextContent(type="text", text=f"Error: {str(e)}")]
 
-    async with stdio_server() as (read_stream, write_stream):
-        logger.info("Webasto Serial Debug MCP Server starting...")
-        await server.run(read_stream, write_stream, server.create_initialization_options())
+        # Run the server
+        async with stdio_server() as (read_stream, write_stream):
+            logger.info("Webasto Serial Debug MCP Server starting...")
+            await server.run(read_stream, write_stream, server.create_initialization_options())